@@ -1,26 +1,86 @@
 import streamlit as st
 from pymongo import MongoClient
-from datetime import datetime
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from datetime import datetime, timezone
+from dateutil.tz import tzlocal
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import bcrypt
+import logging
+
+# bcrypt cost factor: 10 is about 4x cheaper per login than the default of 12,
+# at the price of proportionally faster offline brute force of leaked hashes
+BCRYPT_ROUNDS = 10
+
+# Cap on rows pulled into a single table render
+LISTING_LIMIT = 200
+
+# Server-local timezone with the OS's DST rules, used to display booking times
+LOCAL_TZ = tzlocal()
 
 # ---------------------- DATABASE CONNECTION ----------------------
 @st.cache_resource
+def get_mongo_client():
+    # One client (and its connection pool) shared across reruns and sessions
+    return MongoClient(
+        st.secrets["mongodb_uri"],
+        maxPoolSize=50,
+        minPoolSize=5,
+        serverSelectionTimeoutMS=3000,
+        socketTimeoutMS=5000,
+        waitQueueTimeoutMS=2000,
+        retryWrites=True,
+        tz_aware=True,
+    )
+
 def get_db_connection():
-    client = MongoClient(st.secrets["mongodb_uri"])
-    return client["travel_app"]
+    return get_mongo_client()["travel_app"]
 
 db = get_db_connection()
 
 # ---------------------- INITIAL SETUP ----------------------
+def create_username_index():
+    try:
+        db.users.create_index("username", unique=True)
+        return True
+    except OperationFailure as exc:
+        if exc.code != 11000:
+            raise
+        # Existing duplicate usernames block the unique index; keep lookups indexed
+        db.users.create_index("username")
+        return False
+
+@st.cache_resource
+def ensure_indexes():
+    # Runs once per process; create_index is a no-op if the index exists.
+    # Returns whether usernames are enforced unique by the server.
+    db.bookings.create_index("email")
+    try:
+        return create_username_index()
+    except OperationFailure as exc:
+        # 85/86: IndexOptionsConflict/IndexKeySpecsConflict
+        if exc.code not in (85, 86):
+            raise
+        # A plain username index left by an earlier fallback; rebuild it as unique
+        db.users.drop_index("username_1")
+        return create_username_index()
+
 def initialize_db():
+    ensure_indexes()
+
     # Create default admin if not exists
-    if db.users.count_documents({"role": "admin"}) == 0:
-        password = bcrypt.hashpw("admin123".encode("utf-8"), bcrypt.gensalt())
-        db.users.insert_one({"username": "admin", "password": password, "role": "admin"})
+    if db.users.find_one({"role": "admin"}, {"_id": 1}) is None:
+        if db.users.find_one({"username": "admin"}, {"_id": 1}) is None:
+            password = bcrypt.hashpw("admin123".encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+            db.users.insert_one({"username": "admin", "password": password, "role": "admin"})
+        else:
+            logging.getLogger(__name__).warning(
+                'No admin account exists and the username "admin" is taken by a non-admin user; '
+                'give that user role "admin" in the users collection to restore admin access.'
+            )
 
     # Add 20 real sample destinations
-    if db.destinations.count_documents({}) == 0:
+    if db.destinations.find_one({}, {"_id": 1}) is None:
         sample_destinations = [
             {"name": "Goa", "location": "India", "price": 12000, "description": "Beautiful beaches, water sports, and lively nightlife."},
             {"name": "Shimla", "location": "India", "price": 9000, "description": "Hill station with colonial charm and snow-capped mountains."},
@@ -43,24 +103,32 @@ def initialize_db():
             {"name": "Rajasthan Desert Safari", "location": "India", "price": 14000, "description": "Camel rides and camping under the desert stars."},
             {"name": "Meghalaya", "location": "India", "price": 13000, "description": "Living root bridges and breathtaking waterfalls."}
         ]
-        db.destinations.insert_many(sample_destinations)
+        db.destinations.insert_many(sample_destinations, ordered=False)
 
 initialize_db()
 
 # ---------------------- HELPER FUNCTIONS ----------------------
 def verify_user(username, password):
-    user = db.users.find_one({"username": username})
+    user = db.users.find_one({"username": username}, {"username": 1, "password": 1, "role": 1})
     if user and bcrypt.checkpw(password.encode("utf-8"), user["password"]):
         return user
     return None
 
 def add_user(username, password, role):
-    if db.users.find_one({"username": username}):
+    if not ensure_indexes() and db.users.find_one({"username": username}, {"_id": 1}):
+        return False, "⚠️ Username already exists!"
+    hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+    try:
+        # The unique index on username rejects duplicates server-side
+        db.users.insert_one({"username": username, "password": hashed_pw, "role": role})
+    except DuplicateKeyError:
         return False, "⚠️ Username already exists!"
-    hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-    db.users.insert_one({"username": username, "password": hashed_pw, "role": role})
     return True, "✅ User created successfully!"
 
+@st.cache_data(ttl=60)
+def get_destinations():
+    return list(db.destinations.find({}))
+
 def add_destination(name, location, price, description):
     db.destinations.insert_one({
         "name": name,
@@ -68,18 +136,38 @@ def add_destination(name, location, price, description):
         "price": price,
         "description": description
     })
+    get_destinations.clear()
     return "🌍 Destination added successfully!"
 
+@st.cache_resource
+def get_count_executor():
+    # Shared across reruns so the summary tab doesn't spawn threads per render
+    return ThreadPoolExecutor(max_workers=3)
+
+def get_summary_counts():
+    # Issue the three counts concurrently so their round-trips overlap
+    collections = [db.users, db.destinations, db.bookings]
+    return list(get_count_executor().map(lambda c: c.estimated_document_count(), collections))
+
 def add_booking(name, email, destination, travel_date):
     db.bookings.insert_one({
         "name": name,
         "email": email,
         "destination": destination,
         "travel_date": travel_date,
-        "booking_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        "booking_time": datetime.now(timezone.utc)
     })
     return "✅ Booking confirmed!"
 
+def to_local_booking_times(times):
+    # Bookings made before booking_time became a BSON datetime hold server-local
+    # wall-clock strings; newer ones are UTC and are converted to wall-clock time
+    is_legacy = times.map(lambda v: isinstance(v, str)).astype(bool)
+    local = pd.Series(pd.NaT, index=times.index, dtype="datetime64[ns]")
+    local[is_legacy] = pd.to_datetime(times[is_legacy], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    local[~is_legacy] = pd.to_datetime(times[~is_legacy], utc=True).dt.tz_convert(LOCAL_TZ).dt.tz_localize(None)
+    return local
+
 # ---------------------- LOGIN SYSTEM ----------------------
 def login_page():
     st.title("🌴 Travel Booking App")
@@ -103,6 +191,63 @@ def logout_button():
         st.rerun()
 
 # ---------------------- ADMIN PAGE ----------------------
+# The form tabs are fragments, so typing in them reruns only that tab. A
+# successful write reruns the whole app so the read-only tabs pick it up;
+# the confirmation is carried across that rerun in session_state.
+@st.fragment
+def add_user_tab():
+    st.subheader("Create New User")
+    if "add_user_msg" in st.session_state:
+        st.success(st.session_state.pop("add_user_msg"))
+    username = st.text_input("New Username")
+    password = st.text_input("New Password", type="password")
+    role = st.selectbox("Role", ["user", "admin"])
+    if st.button("Add User"):
+        ok, msg = add_user(username, password, role)
+        if ok:
+            st.session_state.add_user_msg = msg
+            st.rerun(scope="app")
+        st.warning(msg)
+
+def view_users_tab():
+    st.subheader("All Registered Users")
+    cursor = (
+        db.users.find({}, {"_id": 0, "username": 1, "role": 1})
+        .sort("username", 1)
+        .limit(LISTING_LIMIT + 1)
+        .batch_size(100)
+    )
+    # One extra row tells us whether the listing was cut off
+    users = list(cursor)
+    truncated = len(users) > LISTING_LIMIT
+    users = users[:LISTING_LIMIT]
+    if users:
+        st.dataframe(pd.json_normalize(users).reindex(columns=["username", "role"]))
+        if truncated:
+            st.caption(f"Showing the first {LISTING_LIMIT} users by username.")
+    else:
+        st.info("No users found.")
+
+@st.fragment
+def add_destination_tab():
+    st.subheader("Add Travel Destination")
+    if "add_destination_msg" in st.session_state:
+        st.success(st.session_state.pop("add_destination_msg"))
+    name = st.text_input("Destination Name")
+    location = st.text_input("Location")
+    price = st.number_input("Price (INR)", min_value=0.0, format="%.2f")
+    description = st.text_area("Description")
+    if st.button("Add Destination"):
+        st.session_state.add_destination_msg = add_destination(name, location, price, description)
+        st.rerun(scope="app")
+
+def summary_stats_tab():
+    st.subheader("Summary Statistics")
+    total_users, total_destinations, total_bookings = get_summary_counts()
+    st.metric("👥 Total Users", total_users)
+    st.metric("🌍 Total Destinations", total_destinations)
+    st.metric("📦 Total Bookings", total_bookings)
+
 def admin_page():
     st.sidebar.title("👑 Admin Dashboard")
     logout_button()
@@ -110,67 +255,53 @@ def admin_page():
     tab1, tab2, tab3, tab4 = st.tabs(["➕ Add User", "👥 View Users", "🏝️ Add Destination", "📊 Summary Stats"])
 
     with tab1:
-        st.subheader("Create New User")
-        username = st.text_input("New Username")
-        password = st.text_input("New Password", type="password")
-        role = st.selectbox("Role", ["user", "admin"])
-        if st.button("Add User"):
-            ok, msg = add_user(username, password, role)
-            st.success(msg) if ok else st.warning(msg)
+        add_user_tab()
 
     with tab2:
-        st.subheader("All Registered Users")
-        users = list(db.users.find({}, {"password": 0}))
-        if users:
-            st.dataframe(pd.DataFrame(users))
-        else:
-            st.info("No users found.")
+        view_users_tab()
 
     with tab3:
-        st.subheader("Add Travel Destination")
-        name = st.text_input("Destination Name")
-        location = st.text_input("Location")
-        price = st.number_input("Price (INR)", min_value=0.0, format="%.2f")
-        description = st.text_area("Description")
-        if st.button("Add Destination"):
-            msg = add_destination(name, location, price, description)
-            st.success(msg)
+        add_destination_tab()
 
     with tab4:
-        st.subheader("Summary Statistics")
-        total_users = db.users.count_documents({})
-        total_destinations = db.destinations.count_documents({})
-        total_bookings = db.bookings.count_documents({})
-        st.metric("👥 Total Users", total_users)
-        st.metric("🌍 Total Destinations", total_destinations)
-        st.metric("📦 Total Bookings", total_bookings)
+        summary_stats_tab()
 
 # ---------------------- USER PAGE ----------------------
 def user_page():
     st.sidebar.title("🧳 User Dashboard")
     logout_button()
 
+    destinations = get_destinations()
     tab1, tab2, tab3 = st.tabs(["🌍 View Destinations", "📝 Book a Trip", "📅 My Bookings"])
 
     with tab1:
         st.subheader("Available Destinations")
-        destinations = list(db.destinations.find({}))
         if destinations:
-            for dest in destinations:
-                with st.expander(f"{dest['name']} — {dest['location']}"):
-                    st.write(f"💰 Price: ₹{dest['price']}")
-                    st.write(dest['description'])
+            # One table element instead of an expander plus two writes per destination
+            columns = ["name", "location", "price", "description"]
+            st.dataframe(
+                pd.json_normalize(destinations).reindex(columns=columns),
+                hide_index=True,
+                column_config={
+                    "name": "Destination",
+                    "location": "Location",
+                    "price": st.column_config.NumberColumn("💰 Price", format="₹%.2f"),
+                    "description": st.column_config.TextColumn("Description", width="large"),
+                },
+            )
         else:
             st.info("No destinations available yet.")
 
     with tab2:
         st.subheader("Book Your Trip")
-        name = st.text_input("Your Name")
-        email = st.text_input("Email")
-        destinations = [d["name"] for d in db.destinations.find({})]
-        destination = st.selectbox("Select Destination", destinations)
-        travel_date = st.date_input("Travel Date")
-        if st.button("Book Now"):
+        # Inside a form, typing in the fields doesn't rerun the script until submit
+        with st.form("booking_form"):
+            name = st.text_input("Your Name")
+            email = st.text_input("Email")
+            destination = st.selectbox("Select Destination", [d["name"] for d in destinations])
+            travel_date = st.date_input("Travel Date")
+            submitted = st.form_submit_button("Book Now")
+        if submitted:
             msg = add_booking(name, email, destination, str(travel_date))
             st.success(msg)
 
@@ -178,9 +309,22 @@ def user_page():
         st.subheader("Your Bookings")
         email = st.text_input("Enter your email to view bookings")
         if st.button("Show My Bookings"):
-            bookings = list(db.bookings.find({"email": email}))
+            cursor = (
+                db.bookings.find({"email": email}, {"_id": 0, "email": 0})
+                .sort("_id", -1)
+                .limit(LISTING_LIMIT + 1)
+                .batch_size(100)
+            )
+            bookings = list(cursor)
+            truncated = len(bookings) > LISTING_LIMIT
+            bookings = bookings[:LISTING_LIMIT]
             if bookings:
-                st.dataframe(pd.DataFrame(bookings))
+                df = pd.json_normalize(bookings).reindex(columns=["name", "destination", "travel_date", "booking_time"])
+                df["travel_date"] = pd.to_datetime(df["travel_date"], errors="coerce").dt.date
+                df["booking_time"] = to_local_booking_times(df["booking_time"])
+                st.dataframe(df)
+                if truncated:
+                    st.caption(f"Showing your {LISTING_LIMIT} most recent bookings.")
             else:
                 st.info("No bookings found.")
 